@@ -1,13 +1,38 @@
 import streamlit as st
-import base64
 import os
-import sys
 import time
-import io
 import re
-import requests
 from io import StringIO
 import contextlib
+from collections import deque
+from itertools import islice
+
+# Precompiled patterns used by the parse/extract helpers
+_TEMP_ALT = re.compile(r'(\d+)\s*°\s*c(?:elsius)?\b|temperature[^0-9]{0,40}(\d+)\s*°|currently[^0-9]{0,40}(\d+)\s*°', re.I)
+# Overlapping keys (partly cloudy/cloudy, light rain/rain) are ordered most-specific
+# first; stems take their common suffixes so "raining" or "clearing" still match
+_COND_PATTERNS = [
+    (r'partly cloudy', "Partly Cloudy"), (r'light rain(?:y|ing|s)?', "Light Rain"), (r'thunderstorms?', "Thunderstorm"),
+    (r'overcast', "Overcast"), (r'drizzl(?:e|es|ing|y)', "Drizzling"), (r'cloud(?:y|s)?', "Cloudy"), (r'sunny', "Sunny"),
+    (r'clear(?:ing|s)?', "Clear"), (r'rain(?:y|ing|s)?', "Rainy"), (r'mist(?:y)?', "Misty")
+]
+_COND_RE = re.compile(r'\b(?:' + '|'.join(f'({p})' for p, _ in _COND_PATTERNS) + r')\b', re.I)
+_COND_LABELS = [label for _, label in _COND_PATTERNS]
+_WEATHER_RE = re.compile(r'weather|temperature|cloudy|rainy|sunny|forecast|climate', re.I)
+_STEP_RE = re.compile(r'Step (\d+)')
+_DURATION_RE = re.compile(r'Duration ([\d.]+) seconds')
+_LOC_RE = re.compile(r'(?:weather|temperature)\s+(?:in|at|for)\s+([\w\s]+)', re.I)
+_STRIP_TIME_RE = re.compile(r'\b(today|tomorrow|now)\b', re.I)
+_CITY_RE = re.compile(r'\b(mumbai|delhi|bangalore|new york|tokyo|london|chennai)\b', re.I)
+_CITY_MAP = {
+    'mumbai': 'Mumbai', 'delhi': 'Delhi', 'bangalore': 'Bangalore', 'new york': 'New York',
+    'tokyo': 'Tokyo', 'london': 'London', 'chennai': 'Chennai'
+}
+
+# Line markers in SmolAgent's console output
+_STEP_MARKER = "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ Step"
+_EXEC_MARKER = "─ Executing parsed code:"
+_SEP_MARKER = "────────────────────────────────────────────────"
 
 # Set page config
 st.set_page_config(
@@ -29,13 +54,20 @@ except ImportError as e:
 if not SMOLAGENTS_AVAILABLE:
     st.stop()
 
+# Streamlit renderer for each live log level
+_LOG_DISPATCH = {
+    "info": st.info, "success": st.success, "error": st.error,
+    "write": st.write, "code": st.code, "text": st.text
+}
+
 # ✅ Real SmolAgents execution capture
 class RealSmolAgentsExecutionCapture:
     def __init__(self, agent):
         self.agent = agent
-        self.captured_code = []
+        # The wrapper lives in st.session_state, so these stay per-session
+        self.captured_code = deque(maxlen=500)
         self.execution_logs = []
-        self.live_logs = []
+        self.live_logs = deque(maxlen=500)
         self.raw_output = []
         
     def run_with_real_execution_capture(self, query):
@@ -50,8 +82,8 @@ class RealSmolAgentsExecutionCapture:
         stderr_buffer = StringIO()
         
         try:
-            self._add_live_log("🚀 SmolAgent execution started")
-            self._add_live_log(f"📝 Processing query: {query}")
+            self._add_live_log("info", "🚀 SmolAgent execution started")
+            self._add_live_log("text", f"📝 Processing query: {query}")
             
             with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(stderr_buffer):
                 result = self.agent.run(query)
@@ -66,64 +98,70 @@ class RealSmolAgentsExecutionCapture:
             self._parse_real_smolagent_execution(captured_stdout + captured_stderr)
             
             execution_time = time.time() - start_time
-            self._add_live_log(f"✅ SmolAgent execution completed in {execution_time:.2f}s")
-            self._add_live_log(f"📊 Captured {len(self.captured_code)} real code blocks")
+            self._add_live_log("success", f"✅ SmolAgent execution completed in {execution_time:.2f}s")
+            self._add_live_log("text", f"📊 Captured {len(self.captured_code)} real code blocks")
             
             return result
             
         except Exception as e:
-            self._add_live_log(f"❌ Execution error: {str(e)}")
+            self._add_live_log("error", f"❌ Execution error: {str(e)}")
             return f"Execution failed: {str(e)}"
     
     def _parse_real_smolagent_execution(self, output):
         """Parse REAL SmolAgent execution from captured output"""
-        lines = output.split('\n')
         step_counter = 1
         in_code_block = False
         current_code = []
         
-        for line in lines:
-            line = line.strip()
-            
-            if "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ Step" in line:
-                step_match = re.search(r'Step (\d+)', line)
-                if step_match:
-                    step_num = int(step_match.group(1))
-                    self._add_live_log(f"🔍 Step {step_num} detected")
-            
-            elif "─ Executing parsed code:" in line:
-                in_code_block = True
-                current_code = []
-                self._add_live_log("💻 Code execution block found")
+        for line in output.split('\n'):
+            # Plain code lines are the common case; every marker contains a
+            # box-drawing character, so only those lines need the checks below
+            if not in_code_block or "─" in line or "━" in line:
+                if _STEP_MARKER in line:
+                    step_match = _STEP_RE.search(line)
+                    if step_match:
+                        step_num = int(step_match.group(1))
+                        self._add_live_log("write", f"🔍 Step {step_num} detected")
+                    continue
                 
-            elif "────────────────────────────────────────────────" in line and in_code_block:
-                if current_code:
-                    code_text = '\n'.join(current_code)
-                    self.captured_code.append({
-                        'step': step_counter,
-                        'code': code_text,
-                        'type': 'real_execution',
-                        'description': f'SmolAgent Real Execution - Step {step_counter}'
-                    })
-                    self._add_live_log(f"✅ Captured real code block {step_counter}")
-                    step_counter += 1
+                if _EXEC_MARKER in line:
+                    in_code_block = True
+                    current_code = []
+                    self._add_live_log("code", "💻 Code execution block found")
+                    continue
                 
-                in_code_block = False
-                current_code = []
-            
-            elif in_code_block and line:
-                current_code.append(line)
+                if _SEP_MARKER in line and in_code_block:
+                    if current_code:
+                        code_text = '\n'.join(current_code)
+                        self.captured_code.append({
+                            'step': step_counter,
+                            'code': code_text,
+                            'type': 'real_execution',
+                            'description': f'SmolAgent Real Execution - Step {step_counter}'
+                        })
+                        self._add_live_log("success", f"✅ Captured real code block {step_counter}")
+                        step_counter += 1
+                    
+                    in_code_block = False
+                    current_code = []
+                    continue
+                
+                if not in_code_block:
+                    if "Duration" in line and "seconds" in line:
+                        duration_match = _DURATION_RE.search(line)
+                        if duration_match:
+                            self._add_live_log("text", f"⏱️ Step duration: {duration_match.group(1)}s")
+                    continue
             
-            elif "Duration" in line and "seconds" in line:
-                duration_match = re.search(r'Duration ([\d.]+) seconds', line)
-                if duration_match:
-                    self._add_live_log(f"⏱️ Step duration: {duration_match.group(1)}s")
+            code_line = line.strip()
+            if code_line:
+                current_code.append(code_line)
     
-    def _add_live_log(self, log_message):
-        """Add live execution log with timestamp"""
+    def _add_live_log(self, level, log_message):
+        """Add live execution log with timestamp, tagged with its _LOG_DISPATCH level"""
         timestamp = time.strftime("%H:%M:%S")
         formatted_log = f"[{timestamp}] {log_message}"
-        self.live_logs.append(formatted_log)
+        self.live_logs.append((level, formatted_log))
         self.execution_logs.append(formatted_log)
 
 # ✅ Weather functions (maintaining existing functionality)
@@ -140,24 +178,22 @@ def get_weather_via_smolagent_google_search(location, search_tool):
 def parse_weather_from_google_search_results(search_text, location):
     """Parse weather information from SmolAgent's Google search results"""
     try:
-        text = search_text.lower()
-        
-        temp_patterns = [r'(\d+)°c', r'(\d+)° celsius', r'temperature.*?(\d+)°', r'currently.*?(\d+)°']
-        
+        # Single pass over the text; only the first three readings are averaged
         temperatures = []
-        for pattern in temp_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if match.isdigit() and 10 <= int(match) <= 50:
-                    temperatures.append(int(match))
+        for m in _TEMP_ALT.finditer(search_text):
+            value = int(next(g for g in m.groups() if g))
+            if 10 <= value <= 50:
+                temperatures.append(value)
+                if len(temperatures) == 3:
+                    break
         
         if temperatures:
-            temp_c = round(sum(temperatures[:3]) / min(len(temperatures), 3))
+            temp_c = round(sum(temperatures) / len(temperatures))
         else:
             temp_c = get_current_realistic_temp(location)
         
         temp_f = round((temp_c * 9/5) + 32)
-        condition = extract_weather_condition_from_text(text)
+        condition = extract_weather_condition_from_text(search_text)
         
         return {
             "location": location, "temperature_c": temp_c, "temperature_f": temp_f,
@@ -169,15 +205,9 @@ def parse_weather_from_google_search_results(search_text, location):
         return get_current_weather_fallback(location, f"Parse error: {e}")
 
 def extract_weather_condition_from_text(text):
-    conditions = {
-        "sunny": "Sunny", "clear": "Clear", "cloudy": "Cloudy", "partly cloudy": "Partly Cloudy",
-        "overcast": "Overcast", "rainy": "Rainy", "rain": "Rainy", "drizzle": "Drizzling",
-        "mist": "Misty", "light rain": "Light Rain", "thunderstorm": "Thunderstorm"
-    }
-    for key, value in conditions.items():
-        if key in text:
-            return value
-    return "Partly Cloudy"
+    """Return the condition mentioned earliest in the text, not the first in key order"""
+    m = _COND_RE.search(text)
+    return _COND_LABELS[m.lastindex - 1] if m else "Partly Cloudy"
 
 def get_current_realistic_temp(location):
     current_temps = {"mumbai": 27, "delhi": 32, "bangalore": 24, "chennai": 30, "new york": 22, "london": 16}
@@ -202,25 +232,19 @@ def get_weather_icon_for_condition(condition):
     return icons.get(condition, "🌤️")
 
 def extract_location_from_query(query):
-    query_lower = query.lower()
-    location_patterns = [r'(?:weather|temperature)\s+(?:in|at|for)\s+([\w\s]+)']
-    for pattern in location_patterns:
-        match = re.search(pattern, query_lower)
-        if match:
-            location = match.group(1).strip()
-            location = re.sub(r'\b(today|tomorrow|now)\b', '', location).strip()
-            if location:
-                return location.title()
+    """Return the queried location, else the first known city mentioned, else Mumbai"""
+    match = _LOC_RE.search(query)
+    if match:
+        location = match.group(1).strip()
+        location = _STRIP_TIME_RE.sub('', location).strip()
+        if location:
+            return location.title()
     
-    city_keywords = {'mumbai': 'Mumbai', 'delhi': 'Delhi', 'bangalore': 'Bangalore', 'new york': 'New York'}
-    for keyword, city in city_keywords.items():
-        if keyword in query_lower:
-            return city
-    return "Mumbai"
+    m = _CITY_RE.search(query)
+    return _CITY_MAP[m.group(1).lower()] if m else "Mumbai"
 
 def is_weather_query(prompt: str) -> bool:
-    weather_keywords = ["weather", "temperature", "cloudy", "rainy", "sunny", "forecast", "climate"]
-    return any(keyword in prompt.lower() for keyword in weather_keywords)
+    return _WEATHER_RE.search(prompt) is not None
 
 def run_weather_agent_with_smolagent_google_search(query, search_tool):
     """Weather agent using SmolAgent's Google search"""
@@ -251,19 +275,35 @@ def run_weather_agent_with_smolagent_google_search(query, search_tool):
 
 # ✅ Initialize SmolAgents
 @st.cache_resource
-def initialize_smolagents():
+def _load_model_and_search():
+    """Build the heavy, shareable components once per process"""
     try:
         hf_token = os.getenv("HF_TOKEN") or st.secrets.get("HF_TOKEN")
         
         search_tool = DuckDuckGoSearchTool()
         model = InferenceClientModel("Qwen/Qwen2.5-72B-Instruct", token=hf_token)
         base_agent = CodeAgent(tools=[search_tool], model=model)
-        enhanced_agent = RealSmolAgentsExecutionCapture(base_agent)
         
-        return None, search_tool, model, enhanced_agent
+        return search_tool, model, base_agent
     except Exception as e:
         st.error(f"Initialization error: {e}")
+        return None, None, None
+
+def _make_capture(base_agent):
+    return RealSmolAgentsExecutionCapture(base_agent)
+
+def initialize_smolagents():
+    search_tool, model, base_agent = _load_model_and_search()
+    if base_agent is None:
         return None, None, None, None
+    
+    # The capture wrapper holds per-run state, so it lives in the session and is
+    # only rebuilt if the cached agent underneath it has changed
+    capture = st.session_state.get("capture")
+    if capture is None or capture.agent is not base_agent:
+        capture = st.session_state["capture"] = _make_capture(base_agent)
+    
+    return None, search_tool, model, capture
 
 # Load components
 image_tool, search_tool, model, enhanced_agent = initialize_smolagents()
@@ -300,17 +340,16 @@ def run_enhanced_execution_with_live_logs(query):
             
             execution_time = time.time() - execution_start
             status.update(label=f"🎯 Complete: {execution_time:.2f}s", state="complete")
-            
-            return {"result": result}
     
     # Real code execution display
     with tab2:
         st.markdown("### 💻 **REAL SmolAgent Code Execution**")
         
-        if hasattr(enhanced_agent, 'captured_code') and enhanced_agent.captured_code:
-            st.success(f"🔧 **Captured {len(enhanced_agent.captured_code)} REAL code blocks from SmolAgent!**")
+        captured_code = enhanced_agent.captured_code
+        if captured_code:
+            st.success(f"🔧 **Captured {len(captured_code)} REAL code blocks from SmolAgent!**")
             
-            for i, code_block in enumerate(enhanced_agent.captured_code):
+            for code_block in captured_code:
                 with st.expander(f"🔧 **{code_block['description']}**", expanded=True):
                     col1, col2 = st.columns([3, 1])
                     with col1:
@@ -331,24 +370,17 @@ def run_enhanced_execution_with_live_logs(query):
     with tab3:
         st.markdown("### 📋 **Live Execution Logs**")
         
-        if hasattr(enhanced_agent, 'live_logs') and enhanced_agent.live_logs:
-            st.success(f"✅ **Captured {len(enhanced_agent.live_logs)} live log entries**")
+        live_logs = enhanced_agent.live_logs
+        if live_logs:
+            shown = min(len(live_logs), 50)
+            st.success(f"✅ **Captured {len(live_logs)} live log entries** (showing the latest {shown})")
             
-            for log in reversed(enhanced_agent.live_logs):
-                if "🚀" in log or "started" in log:
-                    st.info(log)
-                elif "✅" in log or "completed" in log:
-                    st.success(log)
-                elif "❌" in log or "error" in log:
-                    st.error(log)
-                elif "🔍" in log or "detected" in log:
-                    st.write(f"🔍 {log}")
-                elif "💻" in log or "Code" in log:
-                    st.code(log)
-                else:
-                    st.text(log)
+            for level, log in islice(reversed(live_logs), shown):
+                _LOG_DISPATCH[level](log)
         else:
             st.info("📋 **Live execution logs will appear here...**")
+    
+    return {"result": result}
 
 # ✅ MAIN APPLICATION
 def main():